@@ -14,97 +14,191 @@ cron-monitor.py - Cron任务执行监控脚本
   python3 cron-monitor.py --report          # 生成报告
 """
 
-import argparse
+import heapq
+import mmap
+import os
+import re
 import sys
 from datetime import datetime, timedelta
-from collections import defaultdict
-from typing import Dict, List
-import re
+from collections import defaultdict, namedtuple
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_LOG_FILE = '/var/log/cron-jobs/execution.log'
+
+# 小于该大小的日志直接全量扫描
+TAIL_SCAN_MIN_SIZE = 1 << 20
+# 二分定位缩小到该字节数以内即停止，剩下的交给逐行过滤
+TAIL_SEEK_PRECISION = 4 << 10
+# 读日志的缓冲区大小，减少大日志上的 read() 系统调用次数
+LOG_READ_BUFFER = 256 << 10
+# 执行记录行的开头：时间字段加分隔符，用于在 mmap 上直接校验
+RECORD_PREFIX_RE = re.compile(rb'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\|')
+# 报告中最慢任务、最近失败各保留的条数
+TOP_N = 10
+# 状态到统计字段的映射，其余状态一律计为失败
+STATUS_KEYS = {'SUCCESS': 'success', 'TIMEOUT': 'timeout'}
+
+# 一条执行记录，用于报告中的 Top N 列表；
+# timestamp 保留日志中的原始字符串 'YYYY-MM-DD HH:MM:SS'
+Execution = namedtuple('Execution', 'timestamp job_name status exit_code duration')
+# 解析过程中使用的同字段普通元组，进入报告时才转为 Execution
+Record = Tuple[str, str, str, int, int]
+
 
 class CronMonitor:
     def __init__(self, log_file: str):
         self.log_file = log_file
-        self.executions = []
+        # 统计在解析时就汇总好，不保留逐条执行记录
+        # 汇总状态：(任务, 状态) -> 次数，以及两个 Top N 最小堆
+        self._counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._slowest: List[Tuple[int, int, Record]] = []
+        self._failures: List[Tuple[str, int, Record]] = []
+        self._parsed_hours = None
     
     def parse_log(self, hours: int = 24):
-        """解析日志文件"""
+        """解析日志文件（同一时间窗口只解析一次）"""
+        if hours == self._parsed_hours:
+            return
+        
+        self._counts = defaultdict(int)
+        self._slowest = []
+        self._failures = []
         cutoff_time = datetime.now() - timedelta(hours=hours)
+        # 日志时间只精确到秒，截止时间向上取整，按秒比较时结果不变
+        if cutoff_time.microsecond:
+            cutoff_time = cutoff_time.replace(microsecond=0) + timedelta(seconds=1)
+        # 日志时间格式按字典序即时间序，可以直接比较字符串
+        cutoff_str = cutoff_time.strftime('%Y-%m-%d %H:%M:%S')
+        
+        # 逐行循环是解释器热点，把循环内用到的对象和函数绑定为局部变量
+        counts = self._counts
+        slowest = self._slowest
+        failures = self._failures
+        heappush = heapq.heappush
+        heapreplace = heapq.heapreplace
+        check_timestamp = datetime.fromisoformat
+        intern = sys.intern
         
         try:
-            with open(self.log_file, 'r') as f:
-                for line in f:
+            with open(self.log_file, 'r', encoding='utf-8', errors='replace',
+                      buffering=LOG_READ_BUFFER) as f:
+                self._seek_tail(f, cutoff_str.encode())
+                
+                for seq, line in enumerate(f):
                     # 格式: 2024-02-12 10:30:00|backup-db|SUCCESS|0|120s
                     if '|' not in line:
                         continue
                     
-                    parts = line.strip().split('|')
+                    # 只有 5 个字段，多余的 '|' 会留在最后一个字段里，随后转换失败被跳过
+                    parts = line.strip().split('|', 4)
                     if len(parts) != 5:
                         continue
                     
                     timestamp_str, job_name, status, exit_code, duration = parts
+                    if timestamp_str < cutoff_str:
+                        continue
+                    
+                    # 时间字段必须严格是 'YYYY-MM-DD HH:MM:SS'：fromisoformat 还接受 'T' 分隔、
+                    # 小数秒、时区、纯日期、紧凑和周日期格式，这些会绕过按字符串比较的截止时间。
+                    # 长度、ASCII 和分隔符位置固定后，其余位置只能是 fromisoformat 认可的数字
+                    if (len(timestamp_str) != 19 or not timestamp_str.isascii()
+                            or timestamp_str[10] != ' ' or timestamp_str[4] != '-'
+                            or timestamp_str[7] != '-' or timestamp_str[13] != ':'
+                            or timestamp_str[16] != ':'):
+                        continue
                     
                     try:
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-                        if timestamp < cutoff_time:
-                            continue
-                        
+                        # 格式已严格匹配，这里只校验日期时间取值范围（如 13 月、25 时）；
+                        # 记录里保留原始时间字符串，报告直接输出
+                        check_timestamp(timestamp_str)
+                        exit_code = int(exit_code)
                         duration_sec = int(duration.rstrip('s'))
-                        
-                        self.executions.append({
-                            'timestamp': timestamp,
-                            'job_name': job_name,
-                            'status': status,
-                            'exit_code': int(exit_code),
-                            'duration': duration_sec
-                        })
-                    except (ValueError, IndexError):
+                    except ValueError:
                         continue
+                    
+                    # 任务名和状态只有少数几种，驻留后所有记录共享同一对象
+                    job_name = intern(job_name)
+                    status = intern(status)
+                    record = (timestamp_str, job_name, status, exit_code, duration_sec)
+                    
+                    # 单遍汇总：按 (任务, 状态) 计数，Top N 用定长最小堆保留，
+                    # 堆元素带上 -seq，同值时先出现的记录优先
+                    counts[job_name, status] += 1
+                    
+                    if len(slowest) < TOP_N:
+                        heappush(slowest, (duration_sec, -seq, record))
+                    elif duration_sec > slowest[0][0]:
+                        heapreplace(slowest, (duration_sec, -seq, record))
+                    
+                    if status != 'SUCCESS':
+                        if len(failures) < TOP_N:
+                            heappush(failures, (timestamp_str, -seq, record))
+                        elif timestamp_str > failures[0][0]:
+                            heapreplace(failures, (timestamp_str, -seq, record))
         
         except FileNotFoundError:
             print(f"错误: 日志文件不存在: {self.log_file}")
             sys.exit(1)
+        
+        self._parsed_hours = hours
+    
+    def _seek_tail(self, f, cutoff_bytes: bytes):
+        """大日志按时间二分定位到窗口起点附近，跳过更早的记录"""
+        size = os.fstat(f.fileno()).st_size
+        if size < TAIL_SCAN_MIN_SIZE:
+            return
+        
+        # 日志按时间顺序追加，用 mmap 直接在页缓存上二分查找，只触及探测到的页
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            lo, hi = 0, size
+            while hi - lo > TAIL_SEEK_PRECISION:
+                mid = (lo + hi) // 2
+                first = self._first_timestamp(mm, mid)
+                if first is not None and first < cutoff_bytes:
+                    lo = mid
+                else:
+                    hi = mid
+            
+            # lo 之后的第一条记录早于截止时间，从 lo 所在行的下一行开始解析
+            start = mm.find(b'\n', lo) + 1 if lo else 0
+        
+        f.seek(start)
+    
+    @staticmethod
+    def _first_timestamp(mm: mmap.mmap, pos: int) -> Optional[bytes]:
+        """返回 pos 之后第一条完整记录的时间字段"""
+        pos = mm.find(b'\n', pos) + 1
+        while pos:
+            if RECORD_PREFIX_RE.match(mm, pos):
+                return mm[pos:pos + 19]
+            pos = mm.find(b'\n', pos) + 1
+        return None
     
     def get_stats(self) -> Dict:
-        """获取统计信息"""
-        if not self.executions:
+        """获取统计信息（基于 parse_log 的汇总结果）"""
+        total = sum(self._counts.values())
+        if not total:
             return {}
         
         stats = {
-            'total': len(self.executions),
+            'total': total,
             'success': 0,
             'failed': 0,
             'timeout': 0,
             'by_job': defaultdict(lambda: {'total': 0, 'success': 0, 'failed': 0, 'timeout': 0}),
-            'slowest': [],
-            'recent_failures': []
+            # 最慢的任务
+            'slowest': [Execution._make(r) for _, _, r in sorted(self._slowest, reverse=True)],
+            # 最近的失败
+            'recent_failures': [
+                Execution._make(r) for _, _, r in sorted(self._failures, reverse=True)
+            ]
         }
         
-        for exec in self.executions:
-            job = exec['job_name']
-            status = exec['status']
-            
-            stats['by_job'][job]['total'] += 1
-            
-            if status == 'SUCCESS':
-                stats['success'] += 1
-                stats['by_job'][job]['success'] += 1
-            elif status == 'TIMEOUT':
-                stats['timeout'] += 1
-                stats['by_job'][job]['timeout'] += 1
-            else:
-                stats['failed'] += 1
-                stats['by_job'][job]['failed'] += 1
-                stats['recent_failures'].append(exec)
-        
-        # 最慢的任务
-        stats['slowest'] = sorted(self.executions, key=lambda x: x['duration'], reverse=True)[:10]
-        
-        # 最近的失败
-        stats['recent_failures'] = sorted(
-            [e for e in self.executions if e['status'] != 'SUCCESS'],
-            key=lambda x: x['timestamp'],
-            reverse=True
-        )[:10]
+        for (job, status), n in self._counts.items():
+            key = STATUS_KEYS.get(status, 'failed')
+            stats[key] += n
+            stats['by_job'][job]['total'] += n
+            stats['by_job'][job][key] += n
         
         return stats
     
@@ -117,9 +211,13 @@ class CronMonitor:
             print(f"最近 {hours} 小时内没有执行记录")
             return
         
-        print("\n" + "="*80)
-        print(f"Cron 任务执行报告（最近 {hours} 小时）")
-        print("="*80 + "\n")
+        # 报告逐行收集，最后一次性写出
+        lines = []
+        w = lines.append
+        
+        w("\n" + "="*80)
+        w(f"Cron 任务执行报告（最近 {hours} 小时）")
+        w("="*80 + "\n")
         
         # 总体统计
         total = stats['total']
@@ -128,17 +226,17 @@ class CronMonitor:
         timeout = stats['timeout']
         success_rate = (success / total * 100) if total > 0 else 0
         
-        print("总体统计:")
-        print(f"  总执行次数: {total}")
-        print(f"  成功: {success} ({success_rate:.1f}%)")
-        print(f"  失败: {failed}")
-        print(f"  超时: {timeout}")
-        print()
+        w("总体统计:")
+        w(f"  总执行次数: {total}")
+        w(f"  成功: {success} ({success_rate:.1f}%)")
+        w(f"  失败: {failed}")
+        w(f"  超时: {timeout}")
+        w("")
         
         # 各任务统计
-        print("任务统计:")
-        print(f"{'任务名称':<30} {'总数':<8} {'成功':<8} {'失败':<8} {'成功率':<10}")
-        print("-" * 80)
+        w("任务统计:")
+        w(f"{'任务名称':<30} {'总数':<8} {'成功':<8} {'失败':<8} {'成功率':<10}")
+        w("-" * 80)
         
         for job_name, job_stats in sorted(stats['by_job'].items()):
             total = job_stats['total']
@@ -146,55 +244,56 @@ class CronMonitor:
             failed = job_stats['failed']
             success_rate = (success / total * 100) if total > 0 else 0
             
-            print(f"{job_name:<30} {total:<8} {success:<8} {failed:<8} {success_rate:<9.1f}%")
+            w(f"{job_name:<30} {total:<8} {success:<8} {failed:<8} {success_rate:<9.1f}%")
         
-        print()
+        w("")
         
         # 最慢的任务
         if stats['slowest']:
-            print("最慢的任务（Top 10）:")
-            print(f"{'任务名称':<30} {'执行时间':<15} {'耗时':<10}")
-            print("-" * 80)
+            w("最慢的任务（Top 10）:")
+            w(f"{'任务名称':<30} {'执行时间':<15} {'耗时':<10}")
+            w("-" * 80)
             
             for exec in stats['slowest'][:10]:
-                timestamp = exec['timestamp'].strftime('%m-%d %H:%M')
-                duration = f"{exec['duration']}s"
-                print(f"{exec['job_name']:<30} {timestamp:<15} {duration:<10}")
+                timestamp = exec.timestamp[5:16]  # MM-DD HH:MM
+                duration = f"{exec.duration}s"
+                w(f"{exec.job_name:<30} {timestamp:<15} {duration:<10}")
             
-            print()
+            w("")
         
         # 最近的失败
         if stats['recent_failures']:
-            print("最近的失败:")
-            print(f"{'时间':<20} {'任务名称':<30} {'状态':<10} {'退出码':<8}")
-            print("-" * 80)
+            w("最近的失败:")
+            w(f"{'时间':<20} {'任务名称':<30} {'状态':<10} {'退出码':<8}")
+            w("-" * 80)
             
             for exec in stats['recent_failures'][:10]:
-                timestamp = exec['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-                print(f"{timestamp:<20} {exec['job_name']:<30} {exec['status']:<10} {exec['exit_code']:<8}")
+                w(f"{exec.timestamp:<20} {exec.job_name:<30} {exec.status:<10} {exec.exit_code:<8}")
             
-            print()
+            w("")
         
         # 告警
         if failed > 0 or timeout > 0:
-            print("⚠️  警告:")
+            w("⚠️  警告:")
             if failed > 0:
-                print(f"   - {failed} 个任务执行失败")
+                w(f"   - {failed} 个任务执行失败")
             if timeout > 0:
-                print(f"   - {timeout} 个任务执行超时")
-            print()
+                w(f"   - {timeout} 个任务执行超时")
+            w("")
         else:
-            print("✓ 所有任务执行正常\n")
+            w("✓ 所有任务执行正常\n")
+        
+        sys.stdout.write('\n'.join(lines) + '\n')
     
     def check_health(self) -> bool:
         """健康检查"""
         self.parse_log(1)  # 检查最近1小时
+        stats = self.get_stats()
         
-        if not self.executions:
+        if not stats:
             print("✓ 最近1小时内没有执行记录")
             return True
         
-        stats = self.get_stats()
         failed = stats['failed']
         timeout = stats['timeout']
         
@@ -209,9 +308,16 @@ class CronMonitor:
 
 
 def main():
+    # 定时执行的 --health 最常见，直接处理，省去导入 argparse 的开销
+    if sys.argv[1:] == ['--health']:
+        success = CronMonitor(DEFAULT_LOG_FILE).check_health()
+        sys.exit(0 if success else 1)
+    
+    import argparse
+    
     parser = argparse.ArgumentParser(description='Cron任务执行监控')
     
-    parser.add_argument('--log', default='/var/log/cron-jobs/execution.log',
+    parser.add_argument('--log', default=DEFAULT_LOG_FILE,
                        help='日志文件路径')
     parser.add_argument('--check-last', type=int, default=24,
                        help='检查最近N小时的记录')
@@ -16,27 +16,75 @@ Cron Manager - Crontab集中管理工具
 """
 
 import argparse
+import difflib
+import functools
 import sys
 import os
+import shutil
+import subprocess
 import yaml
 import json
-import subprocess
-import tempfile
+import threading
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 from datetime import datetime
 from colorama import init, Fore, Style
 import paramiko
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 
+# 优先使用 libyaml 的 C 实现，没有编译 libyaml 时退回纯 Python 版本
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 init(autoreset=True)
 
 
+@functools.lru_cache(maxsize=32)
+def _load_yaml_cached(path: str, mtime_ns: int, size: int):
+    """按 (路径, 修改时间, 大小) 缓存解析结果，文件变化后键随之变化"""
+    # libyaml 直接读取字节流，省去一次解码
+    with open(path, 'rb') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
 class CronValidator:
     """Cron表达式验证器"""
     
+    # cron 各字段的取值范围：分 时 日 月 周
+    _CRON_FIELDS = (
+        (0, 59, "分钟"),
+        (0, 23, "小时"),
+        (1, 31, "日期"),
+        (1, 12, "月份"),
+        (0, 7, "星期"),     # 0和7都表示周日
+    )
+    
+    # 单个字段（* 之外）的合法形式：*/步长、起-止、逗号列表、单个数字，
+    # 匹配后按 lastgroup 区分是哪一种
+    _CRON_FIELD_RE = re.compile(
+        r'\*/(?P<step>-?\d+)'
+        r'|(?P<start>\d+)-(?P<end>\d+)'
+        r'|(?P<list>\d+(?:,\d+)+)'
+        r'|(?P<value>\d+)',
+        re.ASCII
+    )
+    
+    # 危险命令模式，合并为一个预编译的正则，一次扫描完成全部匹配
+    _DANGEROUS_COMMAND_RE = re.compile(
+        r'rm\s+-rf\s+/'
+        r'|dd\s+if=.*of=/dev/'
+        r'|mkfs\.'
+        r'|format\s+',
+        re.IGNORECASE
+    )
+    
+    # 多个任务常共用同一调度表达式，校验结果按参数缓存（输入均为不可变字符串）
     @staticmethod
+    @functools.lru_cache(maxsize=512)
     def validate_schedule(schedule: str) -> Tuple[bool, str]:
         """验证cron调度表达式"""
         # 标准cron: 分 时 日 月 周
@@ -46,78 +94,59 @@ class CronValidator:
             return False, "Cron表达式必须有5个字段: 分 时 日 月 周"
         
         # 验证每个字段
-        ranges = [
-            (0, 59, "分钟"),    # 分
-            (0, 23, "小时"),    # 时
-            (1, 31, "日期"),    # 日
-            (1, 12, "月份"),    # 月
-            (0, 7, "星期"),     # 周 (0和7都表示周日)
-        ]
-        
-        for i, (part, (min_val, max_val, name)) in enumerate(zip(parts, ranges)):
+        for part, (min_val, max_val, name) in zip(parts, CronValidator._CRON_FIELDS):
             if part == "*":
                 continue
             
-            # 处理步长 */5
-            if part.startswith("*/"):
-                try:
-                    step = int(part[2:])
-                    if step <= 0:
-                        return False, f"{name}的步长必须大于0"
-                except ValueError:
+            m = CronValidator._CRON_FIELD_RE.fullmatch(part)
+            if m is None:
+                if part.startswith("*/"):
                     return False, f"{name}的步长格式错误"
-                continue
+                if "-" in part:
+                    return False, f"{name}范围格式错误"
+                if "," in part:
+                    return False, f"{name}列表格式错误"
+                return False, f"{name}值格式错误: {part}"
+            
+            kind = m.lastgroup
+            
+            # 处理步长 */5
+            if kind == 'step':
+                if int(m['step']) <= 0:
+                    return False, f"{name}的步长必须大于0"
             
             # 处理范围 1-5
-            if "-" in part:
-                try:
-                    start, end = map(int, part.split("-"))
-                    if not (min_val <= start <= max_val and min_val <= end <= max_val):
-                        return False, f"{name}范围 {start}-{end} 超出有效范围 {min_val}-{max_val}"
-                    if start > end:
-                        return False, f"{name}范围起始值不能大于结束值"
-                except ValueError:
-                    return False, f"{name}范围格式错误"
-                continue
+            elif kind == 'end':
+                start, end = int(m['start']), int(m['end'])
+                if not (min_val <= start <= max_val and min_val <= end <= max_val):
+                    return False, f"{name}范围 {start}-{end} 超出有效范围 {min_val}-{max_val}"
+                if start > end:
+                    return False, f"{name}范围起始值不能大于结束值"
             
             # 处理列表 1,3,5
-            if "," in part:
-                try:
-                    values = [int(v) for v in part.split(",")]
-                    for v in values:
-                        if not (min_val <= v <= max_val):
-                            return False, f"{name}值 {v} 超出有效范围 {min_val}-{max_val}"
-                except ValueError:
-                    return False, f"{name}列表格式错误"
-                continue
+            elif kind == 'list':
+                for v in map(int, part.split(",")):
+                    if not (min_val <= v <= max_val):
+                        return False, f"{name}值 {v} 超出有效范围 {min_val}-{max_val}"
             
             # 单个数字
-            try:
+            else:
                 value = int(part)
                 if not (min_val <= value <= max_val):
                     return False, f"{name}值 {value} 超出有效范围 {min_val}-{max_val}"
-            except ValueError:
-                return False, f"{name}值格式错误: {part}"
         
         return True, "验证通过"
     
     @staticmethod
+    @functools.lru_cache(maxsize=512)
     def validate_command(command: str) -> Tuple[bool, str]:
         """验证命令"""
         if not command or not command.strip():
             return False, "命令不能为空"
         
         # 警告：检查危险命令
-        dangerous_patterns = [
-            r'rm\s+-rf\s+/',
-            r'dd\s+if=.*of=/dev/',
-            r'mkfs\.',
-            r'format\s+',
-        ]
-        
-        for pattern in dangerous_patterns:
-            if re.search(pattern, command, re.IGNORECASE):
-                return False, f"检测到危险命令，请仔细检查: {command}"
+        if CronValidator._DANGEROUS_COMMAND_RE.search(command):
+            return False, f"检测到危险命令，请仔细检查: {command}"
         
         return True, "命令验证通过"
 
@@ -128,15 +157,19 @@ class CronConfig:
     def __init__(self, config_file: str):
         self.config_file = config_file
         self.config = self._load_config()
+        # generate_crontab 结果按用户缓存，配置加载后不再变化
+        self._crontab_cache: Dict[Optional[str], str] = {}
+        # validate 结果缓存，同一实例只验证一次
+        self._validation: Optional[Tuple[bool, List[str]]] = None
     
     def _load_config(self) -> dict:
         """加载配置文件"""
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                if not config:
-                    raise ValueError("配置文件为空")
-                return config
+            st = os.stat(self.config_file)
+            config = _load_yaml_cached(self.config_file, st.st_mtime_ns, st.st_size)
+            if not config:
+                raise ValueError("配置文件为空")
+            return config
         except FileNotFoundError:
             print(f"{Fore.RED}错误: 配置文件不存在: {self.config_file}")
             sys.exit(1)
@@ -146,6 +179,12 @@ class CronConfig:
     
     def validate(self) -> Tuple[bool, List[str]]:
         """验证配置"""
+        if self._validation is None:
+            self._validation = self._validate()
+        return self._validation
+    
+    def _validate(self) -> Tuple[bool, List[str]]:
+        """逐项检查配置"""
         errors = []
         
         # 检查必需字段
@@ -169,18 +208,14 @@ class CronConfig:
                 errors.append(f"服务器组 '{server_group.get('group', i)}' 的 hosts 列表为空")
         
         # 验证任务配置
-        job_names = set()
-        for i, job in enumerate(self.config.get('jobs', [])):
+        jobs = self.config.get('jobs', [])
+        for i, job in enumerate(jobs):
             job_id = f"任务 {i}"
             
             if 'name' not in job:
                 errors.append(f"{job_id} 缺少 'name' 字段")
             else:
-                name = job['name']
-                if name in job_names:
-                    errors.append(f"任务名称重复: {name}")
-                job_names.add(name)
-                job_id = f"任务 '{name}'"
+                job_id = f"任务 '{job['name']}'"
             
             if 'schedule' not in job:
                 errors.append(f"{job_id} 缺少 'schedule' 字段")
@@ -196,6 +231,12 @@ class CronConfig:
                 if not valid:
                     errors.append(f"{job_id} 命令验证失败: {msg}")
         
+        # 重复的任务名称一次性统计，每个名称只报告一次
+        name_counts = Counter(job['name'] for job in jobs if 'name' in job)
+        for name, count in name_counts.items():
+            if count > 1:
+                errors.append(f"任务名称重复: {name}（出现 {count} 次）")
+        
         return len(errors) == 0, errors
     
     def get_hosts(self, group: Optional[str] = None) -> List[str]:
@@ -215,6 +256,14 @@ class CronConfig:
     
     def generate_crontab(self, user: Optional[str] = None) -> str:
         """生成crontab内容"""
+        content = self._crontab_cache.get(user)
+        if content is None:
+            content = self._crontab_cache[user] = self._build_crontab(user)
+        return content
+    
+    def _build_crontab(self, user: Optional[str]) -> str:
+        """拼接crontab文本"""
+        # 逐行 append 后统一 join 一次；实测比 itertools.chain/生成器拼接更快
         lines = []
         lines.append("# Generated by Cron Manager")
         lines.append(f"# Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -257,14 +306,68 @@ class CronConfig:
 class CronDeployer:
     """Cron部署器"""
     
+    # OpenSSH 连接复用：同一主机的后续调用走已认证的主连接，空闲60秒后自动退出
+    # %C 为连接参数的哈希，长度固定，避免长主机名超出unix套接字路径长度限制
+    OPENSSH_CONTROL_PATH = "~/.ssh/cm-%C"
+    OPENSSH_CONTROL_PERSIST = "60s"
+    
     def __init__(self, ssh_user: str = 'root', ssh_key: Optional[str] = None,
-                 ssh_password: Optional[str] = None, ssh_port: int = 22):
+                 ssh_password: Optional[str] = None, ssh_port: int = 22,
+                 use_openssh: bool = False):
         self.ssh_user = ssh_user
         self.ssh_key = ssh_key
         self.ssh_password = ssh_password
         self.ssh_port = ssh_port
+        # 按主机复用SSH连接，同一主机的备份、安装、验证只握手一次
+        self._pool: Dict[str, paramiko.SSHClient] = {}
+        self._pool_lock = threading.Lock()
+        
+        # 系统ssh只用于非Windows、非密码认证（ssh无法非交互输入密码），否则仍用paramiko
+        self._ssh_binary = None
+        if use_openssh:
+            if os.name == 'nt':
+                reason = "Windows 下不支持"
+            elif ssh_password:
+                reason = "密码认证无法使用系统ssh"
+            else:
+                self._ssh_binary = shutil.which('ssh')
+                reason = "未找到ssh命令"
+            
+            if self._ssh_binary:
+                os.makedirs(os.path.expanduser("~/.ssh"), mode=0o700, exist_ok=True)
+            else:
+                print(f"{Fore.YELLOW}警告: --openssh 未生效（{reason}），改用paramiko连接{Style.RESET_ALL}")
+    
+    @staticmethod
+    def _is_active(client: Optional[paramiko.SSHClient]) -> bool:
+        """连接是否仍可用"""
+        if client is None:
+            return False
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
     
     def _get_ssh_client(self, host: str) -> paramiko.SSHClient:
+        """获取SSH连接（优先复用连接池中仍然可用的连接）"""
+        with self._pool_lock:
+            client = self._pool.get(host)
+        if self._is_active(client):
+            return client
+        
+        # 握手在锁外进行，不阻塞其他主机
+        client = self._connect(host)
+        with self._pool_lock:
+            pooled = self._pool.get(host)
+            # 其他线程已先存入可用连接：使用它，丢弃刚建立的连接
+            if self._is_active(pooled):
+                stale, client = client, pooled
+            else:
+                stale = pooled
+                self._pool[host] = client
+        if stale is not None:
+            stale.close()
+        return client
+    
+    def _connect(self, host: str) -> paramiko.SSHClient:
         """创建SSH连接"""
         client = paramiko.SSHClient()
         client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -290,71 +393,111 @@ class CronDeployer:
         except Exception as e:
             raise Exception(f"SSH连接失败: {str(e)}")
     
-    def backup_crontab(self, host: str, user: str = 'root') -> Tuple[bool, str]:
+    def _exec(self, host: str, command: str,
+              input_data: Optional[bytes] = None) -> Tuple[int, bytes, bytes]:
+        """在目标主机执行命令，返回 (退出码, stdout, stderr)"""
+        if self._ssh_binary:
+            return self._exec_openssh(host, command, input_data)
+        
+        client = self._get_ssh_client(host)
+        stdin, stdout, stderr = client.exec_command(command)
+        if input_data is not None:
+            stdin.write(input_data)
+        stdin.channel.shutdown_write()
+        out = stdout.read()
+        exit_code = stdout.channel.recv_exit_status()
+        return exit_code, out, stderr.read()
+    
+    def _exec_openssh(self, host: str, command: str,
+                      input_data: Optional[bytes] = None) -> Tuple[int, bytes, bytes]:
+        """通过系统ssh执行命令（ControlMaster 复用连接）"""
+        cmd = [
+            self._ssh_binary,
+            '-o', 'BatchMode=yes',
+            '-o', 'ControlMaster=auto',
+            '-o', f'ControlPath={self.OPENSSH_CONTROL_PATH}',
+            '-o', f'ControlPersist={self.OPENSSH_CONTROL_PERSIST}',
+            '-o', 'StrictHostKeyChecking=accept-new',
+            '-o', 'ConnectTimeout=10',
+            '-p', str(self.ssh_port),
+            '-l', self.ssh_user,
+        ]
+        if self.ssh_key:
+            cmd += ['-i', self.ssh_key]
+        cmd += [host, command]
+        
+        result = subprocess.run(cmd, input=input_data or b'', capture_output=True)
+        
+        # ssh 自身出错（连接、认证）时退出码为255
+        if result.returncode == 255:
+            raise Exception(f"SSH连接失败: {result.stderr.decode(errors='replace').strip()}")
+        return result.returncode, result.stdout, result.stderr
+    
+    def close_all(self):
+        """关闭连接池中的所有SSH连接"""
+        with self._pool_lock:
+            clients = list(self._pool.values())
+            self._pool.clear()
+        for client in clients:
+            client.close()
+    
+    @staticmethod
+    def _backup_commands(user: str, timestamp: Optional[str] = None) -> Tuple[str, List[str]]:
+        """生成备份文件路径及备份命令"""
+        if timestamp is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_dir = f"/var/backups/crontab"
+        backup_file = f"{backup_dir}/crontab.{user}.{timestamp}"
+        
+        commands = [
+            f"mkdir -p {backup_dir}",
+            f"crontab -u {user} -l > {backup_file} 2>/dev/null || true",
+        ]
+        return backup_file, commands
+    
+    def backup_crontab(self, host: str, user: str = 'root',
+                       timestamp: Optional[str] = None) -> Tuple[bool, str]:
         """备份现有crontab"""
         try:
-            client = self._get_ssh_client(host)
-            
-            # 创建备份目录
-            backup_dir = f"/var/backups/crontab"
-            backup_file = f"{backup_dir}/crontab.{user}.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            commands = [
-                f"mkdir -p {backup_dir}",
-                f"crontab -u {user} -l > {backup_file} 2>/dev/null || echo 'No crontab'",
-            ]
+            backup_file, commands = self._backup_commands(user, timestamp)
             
             for cmd in commands:
-                stdin, stdout, stderr = client.exec_command(cmd)
-                stdout.channel.recv_exit_status()
+                self._exec(host, cmd)
             
-            client.close()
             return True, backup_file
         
         except Exception as e:
             return False, str(e)
     
-    def deploy_crontab(self, host: str, crontab_content: str,
-                      user: str = 'root', backup: bool = True) -> Tuple[bool, str]:
-        """部署crontab到目标主机"""
+    def deploy_crontab(self, host: str, crontab_content: Union[str, bytes],
+                      user: str = 'root', backup: bool = True,
+                      timestamp: Optional[str] = None) -> Tuple[bool, str]:
+        """部署crontab到目标主机（批量部署时传入预先编码好的bytes）"""
+        if isinstance(crontab_content, str):
+            crontab_content = crontab_content.encode('utf-8')
+        if not crontab_content.endswith(b"\n"):
+            crontab_content += b"\n"
+        
         try:
-            client = self._get_ssh_client(host)
+            # 备份、安装合并为一个脚本，每台主机只执行一次命令
+            script = []
             
             # 备份
             if backup:
-                success, msg = self.backup_crontab(host, user)
-                if not success:
-                    print(f"{Fore.YELLOW}  警告: 备份失败 - {msg}")
+                script.extend(self._backup_commands(user, timestamp)[1])
             
-            # 上传新crontab
-            with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
-                f.write(crontab_content)
-                temp_file = f.name
+            # 安装（从标准输入读取新crontab）
+            script.append(f"crontab -u {user} -")
             
-            try:
-                sftp = client.open_sftp()
-                remote_temp = f"/tmp/crontab.{user}.{os.getpid()}"
-                sftp.put(temp_file, remote_temp)
-                sftp.close()
-                
-                # 安装crontab
-                cmd = f"crontab -u {user} {remote_temp} && rm -f {remote_temp}"
-                stdin, stdout, stderr = client.exec_command(cmd)
-                exit_code = stdout.channel.recv_exit_status()
-                
-                if exit_code != 0:
-                    error = stderr.read().decode()
-                    raise Exception(f"安装crontab失败: {error}")
-                
-                # 验证
-                stdin, stdout, stderr = client.exec_command(f"crontab -u {user} -l | wc -l")
-                line_count = stdout.read().decode().strip()
-                
-                client.close()
-                return True, f"部署成功，共 {line_count} 行"
+            exit_code, _, stderr = self._exec(host, "\n".join(script), crontab_content)
+            
+            if exit_code != 0:
+                error = stderr.decode()
+                raise Exception(f"安装crontab失败: {error}")
             
-            finally:
-                os.unlink(temp_file)
+            # 安装失败时退出码非0，成功则行数与本地内容一致，无需远程再查
+            line_count = crontab_content.count(b"\n")
+            return True, f"部署成功，共 {line_count} 行"
         
         except Exception as e:
             return False, str(e)
@@ -362,17 +505,12 @@ class CronDeployer:
     def get_current_crontab(self, host: str, user: str = 'root') -> Tuple[bool, str]:
         """获取当前crontab"""
         try:
-            client = self._get_ssh_client(host)
-            
-            stdin, stdout, stderr = client.exec_command(f"crontab -u {user} -l")
-            exit_code = stdout.channel.recv_exit_status()
+            exit_code, stdout, _ = self._exec(host, f"crontab -u {user} -l")
             
             if exit_code == 0:
-                content = stdout.read().decode()
-                client.close()
+                content = stdout.decode()
                 return True, content
             else:
-                client.close()
                 return True, "# No crontab"
         
         except Exception as e:
@@ -388,10 +526,11 @@ class CronManager:
     
     def list_configs(self) -> List[str]:
         """列出所有配置环境"""
-        configs = []
-        for f in self.config_dir.glob("*.yaml"):
-            configs.append(f.stem)
-        return sorted(configs)
+        # scandir 的目录项自带文件类型，无需为每个文件构造 Path 或 stat
+        with os.scandir(self.config_dir) as it:
+            configs = [e.name[:-5] for e in it if e.name.endswith('.yaml') and e.is_file()]
+        configs.sort()
+        return configs
     
     def load_config(self, env: str) -> CronConfig:
         """加载指定环境的配置"""
@@ -405,20 +544,25 @@ class CronManager:
         """列出任务"""
         config = self.load_config(env)
         
-        print(f"\n{Fore.CYAN}{'='*80}")
-        print(f"环境: {Fore.GREEN}{env}{Fore.CYAN}")
-        print(f"配置文件: {self.config_dir / f'{env}.yaml'}")
-        print(f"{'='*80}{Style.RESET_ALL}\n")
+        # 所有输出先收集，最后一次性写出；
+        # 不再逐次 print，autoreset 不会在每行后复位，需每行自行 RESET_ALL
+        lines = [
+            f"\n{Fore.CYAN}{'='*80}{Style.RESET_ALL}",
+            f"环境: {Fore.GREEN}{env}{Fore.CYAN}{Style.RESET_ALL}",
+            f"配置文件: {self.config_dir / f'{env}.yaml'}",
+            f"{'='*80}{Style.RESET_ALL}\n",
+        ]
         
         jobs = config.get_jobs(enabled_only=False)
         
         if not jobs:
-            print(f"{Fore.YELLOW}没有配置任务")
+            lines.append(f"{Fore.YELLOW}没有配置任务{Style.RESET_ALL}")
+            sys.stdout.write("\n".join(lines) + "\n")
             return
         
         # 表格显示
-        print(f"{Fore.CYAN}{'名称':<20} {'调度':<15} {'用户':<10} {'状态':<8} {'命令':<40}")
-        print(f"{'-'*20} {'-'*15} {'-'*10} {'-'*8} {'-'*40}{Style.RESET_ALL}")
+        lines.append(f"{Fore.CYAN}{'名称':<20} {'调度':<15} {'用户':<10} {'状态':<8} {'命令':<40}{Style.RESET_ALL}")
+        lines.append(f"{'-'*20} {'-'*15} {'-'*10} {'-'*8} {'-'*40}{Style.RESET_ALL}")
         
         for job in jobs:
             name = job['name'][:19]
@@ -428,9 +572,10 @@ class CronManager:
             status = f"{Fore.GREEN}启用" if enabled else f"{Fore.RED}禁用"
             command = job['command'][:39]
             
-            print(f"{name:<20} {schedule:<15} {user:<10} {status:<15} {command:<40}{Style.RESET_ALL}")
+            lines.append(f"{name:<20} {schedule:<15} {user:<10} {status:<15} {command:<40}{Style.RESET_ALL}")
         
-        print(f"\n{Fore.CYAN}总计: {len(jobs)} 个任务{Style.RESET_ALL}")
+        lines.append(f"\n{Fore.CYAN}总计: {len(jobs)} 个任务{Style.RESET_ALL}")
+        sys.stdout.write("\n".join(lines) + "\n")
     
     def validate_config(self, env: str):
         """验证配置"""
@@ -473,36 +618,37 @@ class CronManager:
         content1 = config1.generate_crontab()
         content2 = config2.generate_crontab()
         
-        # 使用diff命令
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.cron') as f1:
-            f1.write(content1)
-            file1 = f1.name
-        
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.cron') as f2:
-            f2.write(content2)
-            file2 = f2.name
+        # 进程内生成 unified diff，按 git diff 的配色输出
+        diff = difflib.unified_diff(
+            content1.splitlines(),
+            content2.splitlines(),
+            fromfile=env1,
+            tofile=env2,
+            lineterm=''
+        )
         
-        try:
-            # 调用git diff获得彩色输出
-            result = subprocess.run(
-                ['git', 'diff', '--no-index', '--color=always', file1, file2],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                print(f"{Fore.GREEN}✓ 配置完全相同{Style.RESET_ALL}")
+        lines = []
+        for line in diff:
+            if line.startswith(('---', '+++')):
+                lines.append(f"{Style.BRIGHT}{line}{Style.RESET_ALL}")
+            elif line.startswith('@@'):
+                lines.append(f"{Fore.CYAN}{line}{Style.RESET_ALL}")
+            elif line.startswith('-'):
+                lines.append(f"{Fore.RED}{line}{Style.RESET_ALL}")
+            elif line.startswith('+'):
+                lines.append(f"{Fore.GREEN}{line}{Style.RESET_ALL}")
             else:
-                print(result.stdout)
+                lines.append(line)
         
-        finally:
-            os.unlink(file1)
-            os.unlink(file2)
+        if not lines:
+            print(f"{Fore.GREEN}✓ 配置完全相同{Style.RESET_ALL}")
+        else:
+            print("\n".join(lines))
     
     def deploy(self, env: str, hosts: Optional[List[str]] = None,
                ssh_user: str = 'root', ssh_key: Optional[str] = None,
                ssh_password: Optional[str] = None, dry_run: bool = False,
-               max_workers: int = 10):
+               max_workers: int = 10, use_openssh: bool = False):
         """部署配置"""
         config = self.load_config(env)
         
@@ -518,6 +664,9 @@ class CronManager:
         if hosts is None:
             hosts = config.get_hosts()
         
+        # 同一主机可能出现在多个分组中，去重并保持顺序
+        hosts = list(dict.fromkeys(hosts))
+        
         if not hosts:
             print(f"{Fore.RED}错误: 没有目标主机{Style.RESET_ALL}")
             return False
@@ -540,38 +689,47 @@ class CronManager:
                 print(f"  • {host}")
             return True
         
-        # 实际部署
-        deployer = CronDeployer(ssh_user, ssh_key, ssh_password)
+        # 实际部署：只编码一次，各主机线程共享同一份bytes
+        crontab_bytes = crontab_content.encode('utf-8')
+        
+        deployer = CronDeployer(ssh_user, ssh_key, ssh_password, use_openssh=use_openssh)
+        
+        # 备份时间戳统一生成一次，同批次各主机的备份文件名一致
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         success_count = 0
         failed_count = 0
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {}
-            
-            for host in hosts:
-                future = executor.submit(
-                    deployer.deploy_crontab,
-                    host,
-                    crontab_content,
-                    ssh_user,
-                    backup=True
-                )
-                futures[future] = host
-            
-            for future in as_completed(futures):
-                host = futures[future]
-                try:
-                    success, message = future.result()
-                    if success:
-                        print(f"{Fore.GREEN}✓ {host}: {message}{Style.RESET_ALL}")
-                        success_count += 1
-                    else:
-                        print(f"{Fore.RED}✗ {host}: {message}{Style.RESET_ALL}")
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {}
+                
+                for host in hosts:
+                    future = executor.submit(
+                        deployer.deploy_crontab,
+                        host,
+                        crontab_bytes,
+                        ssh_user,
+                        backup=True,
+                        timestamp=timestamp
+                    )
+                    futures[future] = host
+                
+                for future in as_completed(futures):
+                    host = futures[future]
+                    try:
+                        success, message = future.result()
+                        if success:
+                            print(f"{Fore.GREEN}✓ {host}: {message}{Style.RESET_ALL}")
+                            success_count += 1
+                        else:
+                            print(f"{Fore.RED}✗ {host}: {message}{Style.RESET_ALL}")
+                            failed_count += 1
+                    except Exception as e:
+                        print(f"{Fore.RED}✗ {host}: 异常 - {str(e)}{Style.RESET_ALL}")
                         failed_count += 1
-                except Exception as e:
-                    print(f"{Fore.RED}✗ {host}: 异常 - {str(e)}{Style.RESET_ALL}")
-                    failed_count += 1
+        finally:
+            deployer.close_all()
         
         # 汇总
         print(f"\n{Fore.CYAN}{'='*80}")
@@ -622,6 +780,9 @@ def main():
 
   # 部署到指定主机
   %(prog)s deploy prod --hosts web-01,web-02
+
+  # 使用系统ssh（ControlMaster 连接复用）
+  %(prog)s deploy prod --ssh-key ~/.ssh/id_rsa --openssh
         """
     )
     
@@ -638,9 +799,14 @@ def main():
     parser.add_argument('--ssh-password', help='SSH密码')
     parser.add_argument('--dry-run', action='store_true', help='演习模式')
     parser.add_argument('--workers', type=int, default=10, help='并发数')
+    parser.add_argument('--openssh', action='store_true',
+                       help='使用系统ssh客户端并复用连接（ControlMaster，需密钥/agent认证）')
     
     args = parser.parse_args()
     
+    if args.workers < 1:
+        parser.error('--workers 必须大于0')
+    
     manager = CronManager(args.config_dir)
     
     try:
@@ -667,7 +833,7 @@ def main():
             
             # 获取SSH密码（如果需要）
             ssh_password = args.ssh_password
-            if not args.ssh_key and not ssh_password:
+            if not args.ssh_key and not ssh_password and not args.openssh:
                 import getpass
                 ssh_password = getpass.getpass('SSH密码: ')
             
@@ -678,7 +844,8 @@ def main():
                 ssh_key=args.ssh_key,
                 ssh_password=ssh_password,
                 dry_run=args.dry_run,
-                max_workers=args.workers
+                max_workers=args.workers,
+                use_openssh=args.openssh
             )
             sys.exit(0 if success else 1)
     